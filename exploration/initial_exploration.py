@@ -12,6 +12,8 @@ YEAR = 2024
 SESSION_KEY = 9662  # Example: 2024 Bahrain (or similar valid key)
 DRIVER_NUMBER = 55  # Carlos Sainz
 LAP_COUNT = 10
+# OpenF1 timestamp format, e.g. 2024-12-08T12:06:52.859000+00:00
+TS_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
 
 def fetch_data(endpoint: str, params: dict) -> pd.DataFrame:
     """Helper to fetch data from OpenF1 API."""
@@ -21,6 +23,15 @@ def fetch_data(endpoint: str, params: dict) -> pd.DataFrame:
     data = resp.json()
     return pd.DataFrame(data)
 
+def parse_timestamps(s: pd.Series) -> pd.Series:
+    """
+    Parse OpenF1 timestamps with a pinned format (C fast path + cache of repeated strings).
+    Whole-second stamps come back without a fraction, so pad them to match TS_FORMAT first.
+    """
+    has_fraction = s.str.contains('.', regex=False, na=True)
+    s = s.where(has_fraction, s.str.slice(0, 19) + '.0' + s.str.slice(19))
+    return pd.to_datetime(s, format=TS_FORMAT, utc=True, cache=True)
+
 def main():
     logger.info(f"Starting exploration for Driver {DRIVER_NUMBER} in Session {SESSION_KEY}...")
 
@@ -34,7 +45,8 @@ def main():
 
     # Filter to last N laps
     laps_df['lap_number'] = pd.to_numeric(laps_df['lap_number'])
-    last_laps = laps_df.sort_values('lap_number', ascending=False).head(LAP_COUNT)
+    last_laps = laps_df.sort_values('lap_number', ascending=False).head(LAP_COUNT).copy()
+    last_laps['date_start'] = parse_timestamps(last_laps['date_start'])
     
     # Get time range (start of first of these laps -> end of last)
     # OpenF1 laps usually have 'date_start'
@@ -43,7 +55,10 @@ def main():
     # For a quick script, we can query by time range if the API supports it, or just fetch all and filter.
     # OpenF1 `car_data` supports `date>...` and `date<...`.
     
-    start_time = last_laps['date_start'].min()
+    start_time = last_laps['date_start'].min().isoformat()
+    # Upper bound: the last lap's start plus a margin covering the lap itself,
+    # so the API doesn't stream the rest of the session
+    end_time = (last_laps['date_start'].max() + pd.Timedelta(minutes=3)).isoformat()
     # There is no date_end in some laps responses, but let's check columns or just assume we want from start_time onwards.
     # Actually, fetching by session+driver is safest for this boilerplate, 
     # but let's try to be smart if the user wants "initial exploration" to be fast.
@@ -51,17 +66,18 @@ def main():
     # OR strictly filter. The prompt asks to "pull the last 10 laps".
     # Relying on `date_start` of the Nth-to-last lap.
     
-    logger.info(f"Targeting data after {start_time}")
+    logger.info(f"Targeting data between {start_time} and {end_time}")
 
     # 2. Fetch Car Data (Telemetry)
     # Verify rate limit handling isn't strictly needed for a single run script, but good practice.
     # We will just use simple requests here as requested.
     logger.info("Fetching car data (telemetry)...")
-    # Using >= start_time to reduce load
+    # Bounded on both sides so filtering happens server-side
     car_params = {
         "session_key": SESSION_KEY, 
         "driver_number": DRIVER_NUMBER, 
-        "date>": start_time
+        "date>": start_time,
+        "date<": end_time
     }
     car_df = fetch_data("car_data", car_params)
     
@@ -70,7 +86,8 @@ def main():
     # Weather is global, fetch for same time range
     weather_params = {
         "session_key": SESSION_KEY,
-        "date>": start_time
+        "date>": start_time,
+        "date<": end_time
     }
     weather_df = fetch_data("weather", weather_params)
 
@@ -78,14 +95,13 @@ def main():
     logger.info("Processing and merging...")
     
     # Standardize Timestamps
-    car_df['date'] = pd.to_datetime(car_df['date'], format='ISO8601')
-    last_laps['date_start'] = pd.to_datetime(last_laps['date_start'], format='ISO8601')
-    weather_df['date'] = pd.to_datetime(weather_df['date'], format='ISO8601')
+    car_df['date'] = parse_timestamps(car_df['date'])
+    weather_df['date'] = parse_timestamps(weather_df['date'])
     
-    # Sort for merge_asof
-    car_df = car_df.sort_values('date')
-    weather_df = weather_df.sort_values('date')
-    last_laps = last_laps.sort_values('date_start')
+    # Sort for merge_asof (stable sort + fresh index so the single-pass asof path is used)
+    car_df = car_df.sort_values('date', kind='mergesort').reset_index(drop=True)
+    weather_df = weather_df.sort_values('date', kind='mergesort').reset_index(drop=True)
+    last_laps = last_laps.sort_values('date_start', kind='mergesort').reset_index(drop=True)
     
     # Merge Laps (to get lap number on telemetry)
     # Rename for merge
@@ -102,6 +118,7 @@ def main():
     merged_df = merged_df.dropna(subset=['lap_number'])
 
     # Merge Weather
+    # merged_df keeps car_df's order, so it is still sorted by date - no re-sort needed.
     # Rename weather date to avoid collision/loss
     weather_merge = weather_df[['date', 'air_temperature', 'track_temperature']].rename(columns={'date': 'weather_date'})
     
@@ -110,7 +127,8 @@ def main():
         weather_merge,
         left_on='date',
         right_on='weather_date',
-        direction='backward'
+        direction='backward',
+        tolerance=pd.Timedelta('5min') # Weather samples ~1/min; older readings count as stale
     )
     
     logger.info(f"Successfully created dataset with {len(final_df)} rows.")
@@ -1,37 +1,53 @@
 import pandas as pd
 import numpy as np
-from scipy.signal import savgol_filter
+import numexpr as ne
+from bottleneck import move_mean
 import logging
+from ingestion.cleaning_kernels import savgol_smooth
 
 logger = logging.getLogger(__name__)
 
+# Narrow dtypes for the wide telemetry/state frames: halving element width halves memory traffic.
+# drs is interpolated with the continuous channels, so it stays a plain float rather than a nullable int.
+FLOAT32_COLS = ['speed', 'rpm', 'throttle', 'brake', 'drs']
+INT8_COLS = ['n_gear', 'gear', 'is_pit_out_lap']
+CATEGORY_COLS = ['compound', 'driver_id', 'circuit_id']
+
+# Telemetry channels smoothed by smooth_telemetry
+SMOOTH_COLS = ['speed', 'rpm', 'throttle', 'brake']
+
+def shrink_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcast the known numeric channels and turn low-cardinality strings into categories.
+    Columns that aren't present are skipped; returns a new frame (untouched columns are not copied).
+    """
+    casts = {c: 'float32' for c in FLOAT32_COLS if c in df.columns}
+    casts.update({c: 'Int8' for c in INT8_COLS if c in df.columns})
+    casts.update({c: 'category' for c in CATEGORY_COLS if c in df.columns})
+    return df.astype(casts) if casts else df
+
 def smooth_telemetry(df: pd.DataFrame, window_length: int = 11, polyorder: int = 3) -> pd.DataFrame:
     """
     Apply Savitzky-Golay filter to smooth telemetry data.
+    Adds '<col>_smooth' columns to df in place (existing columns are never modified).
     """
-    # Columns to smooth
-    cols = ['speed', 'rpm', 'throttle', 'brake']
-    
     # Filter to cols that exist
-    target_cols = [c for c in cols if c in df.columns]
+    target_cols = [c for c in SMOOTH_COLS if c in df.columns]
     
     if not target_cols:
         return df
         
-    df_clean = df.copy()
+    smooth_cols = [f'{col}_smooth' for col in target_cols]
     
-    for col in target_cols:
-        try:
-            # savgol_filter requires window_length <= len(x)
-            if len(df_clean) > window_length:
-                df_clean[f'{col}_smooth'] = savgol_filter(df_clean[col], window_length, polyorder)
-            else:
-                df_clean[f'{col}_smooth'] = df_clean[col]
-        except Exception as e:
-            logger.warning(f"Failed to smooth {col}: {e}")
-            df_clean[f'{col}_smooth'] = df_clean[col]
+    # savgol_filter requires window_length <= len(x)
+    if len(df) > window_length:
+        # One JIT-compiled filter pass over all columns at once (coefficients are cached per window/polyorder)
+        arr = df[target_cols].to_numpy(dtype=np.float32, copy=False)
+        df[smooth_cols] = savgol_smooth(arr, window_length, polyorder)
+    else:
+        df[smooth_cols] = df[target_cols].to_numpy()
             
-    return df_clean
+    return df
 
 def calculate_tire_age_adjusted(df: pd.DataFrame, track_temp: float = 30.0) -> pd.DataFrame:
     """
@@ -55,18 +71,20 @@ def calculate_tire_age_adjusted(df: pd.DataFrame, track_temp: float = 30.0) -> p
     # Group by stint and calculate cumulative count or min lap of stint
     # Fix: ensure lap_number is numeric
     if 'lap_number' in df.columns:
-         df['laps_since_pit'] = df.groupby('stnt')['lap_number'].transform(lambda x: x - x.min())
+         df['laps_since_pit'] = df['lap_number'] - df.groupby('stnt', sort=False)['lap_number'].transform('min')
     else:
          return df
     
     # Adjustment factor
     # If track_temp is a column (dynamic), use it, otherwise constant
     if 'track_temperature' in df.columns:
-        temp = df['track_temperature']
+        temp = df['track_temperature'].to_numpy(dtype=np.float32)
     else:
-        temp = track_temp
+        temp = np.float32(track_temp)
         
-    df['tire_age_adj'] = df['laps_since_pit'] * (1 + 0.05 * (temp - 30.0))
+    # numexpr evaluates the whole expression in one pass, without frame-sized temporaries
+    lsp = df['laps_since_pit'].to_numpy(dtype=np.float32)
+    df['tire_age_adj'] = ne.evaluate('lsp * (1.0 + 0.05 * (temp - 30.0))', local_dict={'lsp': lsp, 'temp': temp})
     
     return df
 
@@ -90,7 +108,14 @@ def calculate_interval_delta(df: pd.DataFrame) -> pd.DataFrame:
     if 'interval' in df.columns:
         # Rolling average of gap (last 3 laps approx? or last 60 seconds?)
         # Since data is time-series, rolling 4Hz * 60s = 240 samples
-        df['interval_avg_60s'] = df['interval'].rolling(window=240, min_periods=1).mean()
-        df['interval_delta'] = df['interval'] - df['interval_avg_60s']
+        interval = df['interval'].to_numpy(dtype=np.float64)
+        if len(interval) == 0:
+            # move_mean rejects empty input; keep the output columns all the same
+            df['interval_avg_60s'] = interval
+            df['interval_delta'] = interval
+            return df
+        # A window longer than the frame is what rolling(240, min_periods=1) gives anyway, but move_mean rejects it
+        df['interval_avg_60s'] = move_mean(interval, window=min(240, len(interval)), min_count=1)
+        df['interval_delta'] = interval - df['interval_avg_60s'].to_numpy()
         
     return df
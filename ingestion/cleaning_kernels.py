@@ -0,0 +1,148 @@
+import numpy as np
+from functools import lru_cache
+from numba import njit, prange
+from scipy.signal import savgol_coeffs, savgol_filter
+
+@lru_cache(maxsize=None)
+def _sg_coeffs(window_length: int, polyorder: int) -> np.ndarray:
+    # Coefficients only depend on (window_length, polyorder), so compute them once
+    return savgol_coeffs(window_length, polyorder, use='dot').astype(np.float32)
+
+# No 'nnan'/'ninf' fast-math flags: telemetry can still hold NaN gaps after interpolation
+@njit(parallel=True, fastmath={'contract', 'reassoc'}, cache=True)
+def _sg_convolve(x, c):
+    """
+    Apply the SG filter taps `c` to every interior row of `x` (n, k).
+    A row whose window holds a NaN keeps its raw value rather than spreading the gap.
+    The first/last len(c) // 2 rows are left unset for the caller to fill.
+    """
+    n, k = x.shape
+    w = c.shape[0]
+    half = w // 2
+    out = np.empty_like(x)
+    for i in prange(half, n - half):
+        for j in range(k):
+            s = 0.0
+            for t in range(w):
+                s += c[t] * x[i - half + t, j]
+            # Any NaN in the window makes the sum NaN
+            out[i, j] = x[i, j] if np.isnan(s) else s
+    return out
+
+@njit(inline='always')
+def _interp_column(col, limit):
+    """
+    In-place linear interpolation of the NaN runs in `col`, with pandas'
+    interpolate(limit=limit, limit_direction='both') rules: a NaN is filled when it is
+    within `limit` steps of a valid value on either side; leading/trailing runs take
+    the nearest valid value.
+    """
+    n = col.shape[0]
+    prev = -1
+    i = 0
+    while i < n:
+        if not np.isnan(col[i]):
+            prev = i
+            i += 1
+            continue
+        # NaN run [i, j) between valid rows prev and j (-1 / n when the run touches an end)
+        j = i
+        while j < n and np.isnan(col[j]):
+            j += 1
+        if prev >= 0 or j < n:
+            for m in range(i, j):
+                near_prev = prev >= 0 and m - prev <= limit
+                near_next = j < n and j - m <= limit
+                if not (near_prev or near_next):
+                    continue
+                if prev < 0:
+                    col[m] = col[j]
+                elif j == n:
+                    col[m] = col[prev]
+                else:
+                    # Same arithmetic as np.interp, in float64
+                    slope = (np.float64(col[j]) - np.float64(col[prev])) / (j - prev)
+                    col[m] = slope * (m - prev) + np.float64(col[prev])
+        i = j
+
+@njit(parallel=True, fastmath={'contract', 'reassoc'}, cache=True)
+def _interp_sg(x, limit, smooth_slot, c):
+    """
+    Interpolate every column of `x` (n, k) in place and, for columns with smooth_slot[j] >= 0,
+    apply the SG filter taps `c` to the freshly interpolated column while it is still in cache.
+    Returns the smoothed columns (n, n_smooth); rows whose window still holds a NaN keep the
+    interpolated value, and the first/last len(c) // 2 rows are left unset.
+    """
+    n, k = x.shape
+    w = c.shape[0]
+    half = w // 2
+    n_smooth = 0
+    for j in range(k):
+        if smooth_slot[j] >= 0:
+            n_smooth += 1
+    out = np.empty((n, n_smooth), dtype=x.dtype)
+    for j in prange(k):
+        col = x[:, j]
+        _interp_column(col, limit)
+        slot = smooth_slot[j]
+        if slot < 0:
+            continue
+        for i in range(half, n - half):
+            s = 0.0
+            for t in range(w):
+                s += c[t] * col[i - half + t]
+            out[i, slot] = col[i] if np.isnan(s) else s
+    return out
+
+def _fill_edges(x: np.ndarray, out: np.ndarray, window_length: int, polyorder: int):
+    """
+    Fill the first/last window_length // 2 rows of `out` with the SG 'interp' edge fit of `x`.
+    'interp' edges fit one polynomial to the first/last window, so filtering just that slice is exact.
+    The polynomial fit rejects NaNs; a column whose edge window still has gaps keeps its raw values there.
+    """
+    half = window_length // 2
+    for window, rows in ((x[:window_length], slice(None, half)), (x[-window_length:], slice(-half, None))):
+        out[rows] = window[rows]
+        fit = np.isfinite(window).all(axis=0)
+        if fit.any():
+            out[rows, fit] = savgol_filter(window[:, fit], window_length, polyorder, axis=0)[rows]
+
+def savgol_smooth(x: np.ndarray, window_length: int = 11, polyorder: int = 3) -> np.ndarray:
+    """
+    Savitzky-Golay smoothing along axis 0 of a 2-D array.
+    Matches savgol_filter(x, window_length, polyorder, axis=0) with its default 'interp' edge mode.
+    Requires an odd window_length and len(x) >= window_length. Rows whose window (or edge window)
+    holds a NaN are passed through unsmoothed, so a gap never widens into its neighbours.
+    """
+    if window_length % 2 == 0:
+        raise ValueError("window_length must be odd")
+
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    out = _sg_convolve(x, _sg_coeffs(window_length, polyorder))
+    _fill_edges(x, out, window_length, polyorder)
+    return out
+
+def interpolate_smooth(x: np.ndarray, smooth_idx, limit: int = 8, window_length: int = 11, polyorder: int = 3):
+    """
+    Fused interpolate_missing + savgol_smooth over the columns of a 2-D array.
+    Every column is linearly interpolated (see _interp_column); the columns listed in
+    `smooth_idx` are then SG-smoothed in the same pass.
+    Returns (interpolated float32 array, smoothed float32 array of len(smooth_idx) columns).
+    With len(x) <= window_length the "smoothed" columns are just the interpolated ones.
+    """
+    if window_length % 2 == 0:
+        raise ValueError("window_length must be odd")
+
+    # Column-major copy: each column the kernel walks is contiguous, and the caller's array is left untouched
+    x = np.array(x, dtype=np.float32, order='F')
+    smooth_idx = list(smooth_idx)
+    if len(x) <= window_length:
+        # Too short to smooth: interpolate only
+        _interp_sg(x, limit, np.full(x.shape[1], -1, dtype=np.int64), _sg_coeffs(window_length, polyorder))
+        return x, x[:, smooth_idx].copy()
+
+    smooth_slot = np.full(x.shape[1], -1, dtype=np.int64)
+    smooth_slot[smooth_idx] = np.arange(len(smooth_idx))
+    out = _interp_sg(x, limit, smooth_slot, _sg_coeffs(window_length, polyorder))
+    _fill_edges(x[:, smooth_idx], out, window_length, polyorder)
+    return x, out
@@ -1,29 +1,57 @@
 import asyncio
 import logging
-import aiohttp
+import httpx
+import ijson
+import pyarrow as pa
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    import json
+    loads = json.loads
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://api.openf1.org/v1"
 
+class _AsyncByteReader:
+    """Minimal async file-like view of an httpx byte stream, so ijson can pull from it."""
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.aiter_bytes()
+
+    async def read(self, n: int = -1) -> bytes:
+        # ijson probes with read(0) to detect bytes vs str; don't consume a chunk for it
+        if n == 0:
+            return b""
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b""
+
 class OpenF1Client:
     def __init__(self, concurrency_limit: int = 5):
         self.semaphore = asyncio.Semaphore(concurrency_limit)
         self.session = None
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        # HTTP/2 multiplexes the concurrent driver fetches over one TLS connection
+        self.session = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+            timeout=30.0,
+        )
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
-            await self.session.close()
+            await self.session.aclose()
 
     @retry(
-        retry=retry_if_exception_type(aiohttp.ClientResponseError),
+        retry=retry_if_exception_type(httpx.HTTPStatusError),
         stop=stop_after_attempt(5),
         wait=wait_exponential(multiplier=1, min=2, max=10)
     )
@@ -37,24 +65,70 @@ class OpenF1Client:
         url = f"{BASE_URL}/{endpoint}"
         
         async with self.semaphore:
-            async with self.session.get(url, params=params) as response:
-                if response.status == 429:
+            response = await self.session.get(url, params=params)
+            if response.status_code == 429:
+                logger.warning(f"Rate limited on {endpoint}. Retrying...")
+                response.raise_for_status() # Trigger retry
+            
+            if response.status_code >= 500:
+                 logger.warning(f"Server error {response.status_code} on {endpoint}. Retrying...")
+                 response.raise_for_status()
+
+            response.raise_for_status()
+            
+            # Check content type, some errors might return text/html instead of json
+            if "application/json" not in response.headers.get("Content-Type", ""):
+                 logger.error(f"Unexpected content type: {response.headers.get('Content-Type')}. Body: {response.text[:100]}")
+                 raise httpx.DecodingError("Expected JSON response", request=response.request)
+
+            return loads(response.content)
+
+    @retry(
+        retry=retry_if_exception_type(httpx.HTTPStatusError),
+        stop=stop_after_attempt(5),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def fetch_table(self, endpoint: str, params: dict = None, batch_size: int = 50_000) -> pa.Table:
+        """
+        Stream-parse a (large) JSON list response straight into an Arrow table.
+        Records are decoded incrementally as bytes arrive and flushed to Arrow every `batch_size` items,
+        so the full list of dicts is never held in memory at once.
+        """
+        if self.session is None:
+             raise RuntimeError("Client session not initialized. Use 'async with' context.")
+
+        url = f"{BASE_URL}/{endpoint}"
+        tables = []
+        
+        async with self.semaphore:
+            async with self.session.stream("GET", url, params=params) as response:
+                if response.status_code == 429:
                     logger.warning(f"Rate limited on {endpoint}. Retrying...")
                     response.raise_for_status() # Trigger retry
                 
-                if response.status >= 500:
-                     logger.warning(f"Server error {response.status} on {endpoint}. Retrying...")
+                if response.status_code >= 500:
+                     logger.warning(f"Server error {response.status_code} on {endpoint}. Retrying...")
                      response.raise_for_status()
 
                 response.raise_for_status()
                 
-                # Check content type, some errors might return text/html instead of json
                 if "application/json" not in response.headers.get("Content-Type", ""):
-                     text = await response.text()
-                     logger.error(f"Unexpected content type: {response.headers.get('Content-Type')}. Body: {text[:100]}")
-                     raise aiohttp.ContentTypeError(response.request_info, response.history, message="Expected JSON response")
+                     logger.error(f"Unexpected content type: {response.headers.get('Content-Type')}.")
+                     raise httpx.DecodingError("Expected JSON response", request=response.request)
+
+                batch = []
+                async for item in ijson.items_async(_AsyncByteReader(response), 'item', use_float=True):
+                    batch.append(item)
+                    if len(batch) >= batch_size:
+                        tables.append(pa.Table.from_pylist(batch))
+                        batch = []
+                if batch:
+                    tables.append(pa.Table.from_pylist(batch))
 
-                return await response.json()
+        if not tables:
+            return pa.table({})
+        # Permissive promotion covers a column that happened to be all-null in one batch
+        return pa.concat_tables(tables, promote_options="permissive")
 
     async def fetch_all_pages(self, endpoint: str, params: dict = None):
          # OpenF1 typically returns all data in one go (streaming-like) or manageable chunks.
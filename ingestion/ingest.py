@@ -1,10 +1,11 @@
 import asyncio
+import atexit
 import logging
-import os
-import json
-import pandas as pd
-from typing import Set
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from pathlib import Path
+from ingestion import state
 from ingestion.client import OpenF1Client
 from ingestion.session_manager import SessionManager
 from ingestion.ingest_car_data import fetch_car_data
@@ -16,104 +17,104 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 DATA_DIR = Path("data/raw")
+# JSON snapshot of the SQLite checkpoints (see ingestion/state.py), kept for human inspection
 STATE_FILE = DATA_DIR / "ingestion_state.json"
+# Fetch car_data for the whole session in one request and split it by driver locally.
+# Turn off for single-driver debug runs, where the per-driver queries download far less.
+BATCH_CAR_DATA = True
 
-def load_state() -> dict:
-    if STATE_FILE.exists():
-        try:
-            with open(STATE_FILE, "r") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
-
-def save_state(state: dict):
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2)
-
-async def process_session(client: OpenF1Client, session_key: int, state: dict):
-    session_str = str(session_key)
-    if session_str not in state:
-        state[session_str] = {"laps": False, "weather": False, "drivers": []}
-    
-    session_state = state[session_str]
-    
+async def process_session(client: OpenF1Client, session_key: int):
     # 1. Fetch Laps (to get driver list)
     laps_path = DATA_DIR / f"laps_{session_key}.parquet"
-    laps_df = pd.DataFrame()
+    laps_tbl = pa.table({})
     
-    if not session_state.get("laps") or not laps_path.exists():
-        laps_df = await fetch_laps(client, session_key)
-        if not laps_df.empty:
-            laps_df.to_parquet(laps_path, index=False)
-            session_state["laps"] = True
-            save_state(state)
+    if not state.is_done(session_key, "laps") or not laps_path.exists():
+        laps_tbl = await fetch_laps(client, session_key)
+        if laps_tbl.num_rows:
+            await asyncio.to_thread(pq.write_table, laps_tbl, laps_path, compression='zstd', compression_level=3)
+            state.mark(session_key, "laps")
     else:
         logger.info(f"Laps for {session_key} already fetched.")
-        laps_df = pd.read_parquet(laps_path)
+        laps_tbl = pq.read_table(laps_path, columns=['driver_number'])
 
     # 2. Fetch Weather
     weather_path = DATA_DIR / f"weather_{session_key}.parquet"
-    if not session_state.get("weather") or not weather_path.exists():
+    if not state.is_done(session_key, "weather") or not weather_path.exists():
         weather_df = await fetch_weather(client, session_key)
         if not weather_df.empty:
-            weather_df.to_parquet(weather_path, index=False)
-            session_state["weather"] = True
-            save_state(state)
+            await asyncio.to_thread(weather_df.to_parquet, weather_path, index=False, compression='zstd', compression_level=3)
+            state.mark(session_key, "weather")
     else:
          logger.info(f"Weather for {session_key} already fetched.")
 
     # 3. Fetch Car Data for All Drivers
-    if laps_df.empty:
+    if laps_tbl.num_rows == 0:
         logger.warning(f"No laps data for {session_key}, cannot determine drivers.")
         return
 
-    drivers = laps_df['driver_number'].unique()
-    logged_drivers = set(session_state.get("drivers", []))
-    
-    tasks = []
+    drivers = pc.unique(laps_tbl['driver_number']).to_pylist()
+    logged_drivers = state.done_drivers(session_key)
     
+    async def save_driver(driver, tbl):
+        # Encode off the event loop so the next driver's download overlaps this write
+        path = DATA_DIR / f"car_{session_key}_{driver}.parquet"
+        await asyncio.to_thread(pq.write_table, tbl, path, compression='zstd', compression_level=3)
+        # Checkpoint per driver: a single-row insert, so an interrupted run resumes from here
+        state.mark(session_key, "car", driver)
+        return driver
+
     async def fetch_and_save_driver(driver):
-        if str(driver) in logged_drivers:
-             # logger.info(f"Driver {driver} already fetched.") 
-             # keeping logs quiet for skipped items
-             return
-             
-        df = await fetch_car_data(client, session_key, driver)
-        if not df.empty:
-            df.to_parquet(DATA_DIR / f"car_{session_key}_{driver}.parquet", index=False)
-            # Update state safely (in main thread context ideally, but we'll modify the set and save at end/periodically)
-            # actually, concurrent modification of the dict/set might be risky if we save continuously.
-            # We'll return the driver number and update state in the gather.
-            return driver
+        tbl = await fetch_car_data(client, session_key, driver)
+        if tbl.num_rows:
+            return await save_driver(driver, tbl)
         return None
 
+    async def fetch_and_save_session(pending):
+        # One request for every driver, then split the table on driver_number
+        all_tbl = await fetch_car_data(client, session_key)
+        if all_tbl.num_rows == 0:
+            return []
+        # Stable sort, so each driver's rows stay in time order as one contiguous run;
+        # the runs are then zero-copy slices instead of a full-table filter per driver
+        all_tbl = all_tbl.sort_by('driver_number')
+        runs = pc.value_counts(all_tbl['driver_number'])
+        pending = set(pending)
+        split_tasks = []
+        offset = 0
+        for driver, count in zip(runs.field('values').to_pylist(), runs.field('counts').to_pylist()):
+            if driver in pending:
+                split_tasks.append(save_driver(driver, all_tbl.slice(offset, count)))
+            offset += count
+        return await asyncio.gather(*split_tasks)
+
     # Semaphore is already inside client.fetch, so we can spawn many tasks.
     # But let's batch them slightly or just fire all (asyncio.gather handles it, client limits concurrency).
     logger.info(f"Found {len(drivers)} drivers. Fetching telemetry...")
     
-    pending_drivers = [d for d in drivers if str(d) not in logged_drivers]
+    pending_drivers = [d for d in drivers if d not in logged_drivers]
     
     if not pending_drivers:
         logger.info("All drivers already fetched for this session.")
         return
 
-    # Create tasks
-    tasks = [fetch_and_save_driver(d) for d in pending_drivers]
-    
-    # Run tasks
-    results = await asyncio.gather(*tasks)
+    if BATCH_CAR_DATA:
+        results = await fetch_and_save_session(pending_drivers)
+    else:
+        # Create tasks
+        tasks = [fetch_and_save_driver(d) for d in pending_drivers]
+
+        # Run tasks
+        results = await asyncio.gather(*tasks)
     
-    # Update State
     newly_fetched = [r for r in results if r is not None]
     if newly_fetched:
-        session_state["drivers"].extend([int(x) for x in newly_fetched])
-        save_state(state)
         logger.info(f"Fetched and saved {len(newly_fetched)} new drivers.")
 
 async def main():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    state = load_state()
+    state.import_json(STATE_FILE)
+    # Refresh the JSON snapshot on shutdown, including after a crash mid-session
+    atexit.register(state.snapshot, STATE_FILE)
     
     async with OpenF1Client(concurrency_limit=5) as client: # Limit concurrent requests
         session_mgr = SessionManager(client)
@@ -124,7 +125,7 @@ async def main():
             return
 
         logger.info(f"Processing Session: {session_key}")
-        await process_session(client, session_key, state)
+        await process_session(client, session_key)
         
     logger.info("Ingestion Complete.")
 
@@ -1,30 +1,41 @@
 import logging
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from ingestion.client import OpenF1Client
 
 logger = logging.getLogger(__name__)
 
-async def fetch_car_data(client: OpenF1Client, session_key: int, driver_number: int = None) -> pd.DataFrame:
+# Compact Parquet dtypes; every value OpenF1 reports for these fits comfortably
+CAR_DTYPES = {
+    'driver_number': pa.int16(), 'rpm': pa.int16(), 'speed': pa.int16(), 'n_gear': pa.int8(),
+    'throttle': pa.uint8(), 'brake': pa.uint8(), 'drs': pa.uint8(),
+}
+
+async def fetch_car_data(client: OpenF1Client, session_key: int, driver_number: int = None) -> pa.Table:
     """
     Fetch car data (telemetry) for a specific session.
     Optionally filter by driver_number.
+    Returns an Arrow table so callers can write Parquet without a pandas round-trip.
+    The response is stream-parsed, so a full-session payload never sits in memory as Python dicts.
     """
     params = {"session_key": session_key}
     if driver_number:
         params["driver_number"] = driver_number
         
     logger.info(f"Fetching car data for session {session_key}...")
-    data = await client.fetch("car_data", params=params)
+    tbl = await client.fetch_table("car_data", params=params)
     
-    if not data:
+    if tbl.num_rows == 0:
         logger.warning(f"No car data found for session {session_key}")
-        return pd.DataFrame()
-        
-    df = pd.DataFrame(data)
+        return tbl
     
     # Standardize timestamp
-    if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'], format='ISO8601')
+    # Arrow's ISO8601 cast copes with the mixed fractional-second precision OpenF1 returns
+    if 'date' in tbl.column_names:
+        idx = tbl.schema.get_field_index('date')
+        tbl = tbl.set_column(idx, 'date', pc.cast(tbl['date'], pa.timestamp('us', tz='UTC')))
+    
+    tbl = tbl.cast(pa.schema([pa.field(f.name, CAR_DTYPES.get(f.name, f.type)) for f in tbl.schema]))
         
-    logger.info(f"Fetched {len(df)} car data records for session {session_key}")
-    return df
+    logger.info(f"Fetched {tbl.num_rows} car data records for session {session_key}")
+    return tbl
@@ -1,12 +1,17 @@
 import logging
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from ingestion.client import OpenF1Client
 
 logger = logging.getLogger(__name__)
 
-async def fetch_laps(client: OpenF1Client, session_key: int, driver_number: int = None) -> pd.DataFrame:
+# Compact Parquet dtypes for the small integer columns
+LAP_DTYPES = {'driver_number': pa.int16(), 'lap_number': pa.int16()}
+
+async def fetch_laps(client: OpenF1Client, session_key: int, driver_number: int = None) -> pa.Table:
     """
     Fetch laps data for a specific session.
+    Returns an Arrow table so callers can write Parquet without a pandas round-trip.
     """
     params = {"session_key": session_key}
     if driver_number:
@@ -17,15 +22,18 @@ async def fetch_laps(client: OpenF1Client, session_key: int, driver_number: int
     
     if not data:
         logger.warning(f"No laps data found for session {session_key}")
-        return pd.DataFrame()
+        return pa.table({})
 
-    df = pd.DataFrame(data)
+    tbl = pa.Table.from_pylist(data)
     
     # Standardize timestamps
     # Laps often have 'date_start' and 'date_end', maybe just 'date_start' is 'date'
     # Checking docs or typical API response: laps usually have date_start
-    if 'date_start' in df.columns:
-        df['date_start'] = pd.to_datetime(df['date_start'], format='ISO8601')
+    if 'date_start' in tbl.column_names:
+        idx = tbl.schema.get_field_index('date_start')
+        tbl = tbl.set_column(idx, 'date_start', pc.cast(tbl['date_start'], pa.timestamp('us', tz='UTC')))
+    
+    tbl = tbl.cast(pa.schema([pa.field(f.name, LAP_DTYPES.get(f.name, f.type)) for f in tbl.schema]))
         
-    logger.info(f"Fetched {len(df)} laps for session {session_key}")
-    return df
+    logger.info(f"Fetched {tbl.num_rows} laps for session {session_key}")
+    return tbl
@@ -2,16 +2,13 @@ import requests
 import pandas as pd
 import logging
 import time
-from pathlib import Path
+from collections import defaultdict
+from ingestion.jolpica import API_BASE, DATA_DIR, get_session, loads, season_expire_after, append_stops, parse_durations
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Jolpica / Ergast API Base
-API_BASE = "https://api.jolpi.ca/ergast/f1"
-DATA_DIR = Path("data/strategy")
-
 def fetch_pitstops(season: int) -> pd.DataFrame:
     """
     Fetch all pit stops for a given season.
@@ -19,20 +16,22 @@ def fetch_pitstops(season: int) -> pd.DataFrame:
     We need to paginate heavily as there are ~40-80 stops per race * 20 races = 800-1600 stops.
     It's better to iterate by round to avoid massive offsets and huge requests.
     """
-    stops_list = []
+    session = get_session()
+    cols = defaultdict(list)
+    expire_after = season_expire_after(season)
     
     # Get schedule first to know how many rounds
     for attempt in range(5):
         try:
             schedule_url = f"{API_BASE}/{season}.json"
-            resp = requests.get(schedule_url, timeout=10)
+            resp = session.get(schedule_url, timeout=10, expire_after=expire_after)
             if resp.status_code == 429:
                 sleep_time = (2 ** attempt) + 1
                 logger.warning(f"Rate limited on schedule {season}. Sleeping {sleep_time}s...")
                 time.sleep(sleep_time)
                 continue
             resp.raise_for_status()
-            data = resp.json()
+            data = loads(resp.content)
             total_rounds = int(data['MRData']['RaceTable']['Races'][-1]['round'])
             break
         except Exception as e:
@@ -49,7 +48,7 @@ def fetch_pitstops(season: int) -> pd.DataFrame:
         # Retry loop
         for attempt in range(5):
             try:
-                resp = requests.get(url, timeout=10)
+                resp = session.get(url, timeout=10, expire_after=expire_after)
                 if resp.status_code == 429:
                     # Exponential backoff
                     sleep_time = (2 ** attempt) + 0.5
@@ -58,9 +57,9 @@ def fetch_pitstops(season: int) -> pd.DataFrame:
                     continue
                 
                 resp.raise_for_status()
-                race_data = resp.json()['MRData']['RaceTable']['Races']
+                race_data = loads(resp.content)['MRData']['RaceTable']['Races']
                 break # Success
-            except requests.exceptions.RequestException as e:
+            except (requests.exceptions.RequestException, ValueError) as e:
                 logger.error(f"Request failed {url}: {e}")
                 time.sleep(1)
         else:
@@ -71,59 +70,18 @@ def fetch_pitstops(season: int) -> pd.DataFrame:
             if not race_data:
                 continue
                 
-            race = race_data[0] # The race object
-            # Race info isn't in the PitStop list directly usually, but in the Race object
-            race_name = race['raceName']
-            date = race['date']
-            circuit_id = race['Circuit']['circuitId'] if 'Circuit' in race else None 
-            # Note: Jolpica/Ergast sometimes nests Circuit inside Race, sometimes not for pitstops endpoint depending on query.
-            # Let's double check structure. Usually PitStops endpoint is: RaceTable -> Races[0] -> PitStops
-            
-            if 'PitStops' not in race:
-                continue
-
-                row = {
-                    'season': season,
-                    'round': r,
-                    'race_name': race_name,
-                    'date': date,
-                    'driver_id': stop['driverId'],
-                    'lap': int(stop['lap']),
-                    'stop_number': int(stop['stop']),
-                    'time': stop['time'],
-                    'duration_str': stop['duration'] # Keep original string just in case
-                }
-                
-                # Handling duration parsing
-                # Usually 'duration' is "21.565" (seconds) or "1:02.123" (minutes:seconds)
-                # 'milliseconds' field is safest if available as integer ms.
-                
-                if 'milliseconds' in stop:
-                     try:
-                        row['duration'] = int(stop['milliseconds']) / 1000.0
-                     except:
-                        row['duration'] = None
-                else:
-                    # Parse string duration "21.565" or "1:02.123"
-                    d_str = stop['duration']
-                    try:
-                        if ':' in d_str:
-                            parts = d_str.split(':')
-                            row['duration'] = float(parts[0]) * 60 + float(parts[1])
-                        else:
-                            row['duration'] = float(d_str)
-                    except:
-                        row['duration'] = None
-
-                stops_list.append(row)
+            append_stops(cols, season, r, race_data[0])
                 
-            # Be nice to the API
-            time.sleep(0.2)
+            # Be nice to the API (cache hits never reach it)
+            if not resp.from_cache:
+                time.sleep(0.2)
             
         except Exception as e:
             logger.error(f"Error fetching {season} round {r} pitstops: {e}")
             
-    return pd.DataFrame(stops_list)
+    if not cols:
+        return pd.DataFrame()
+    return parse_durations(pd.DataFrame(cols))
 
 def main():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -144,7 +102,7 @@ def main():
         final_df = pd.concat(all_seasons, ignore_index=True)
         # Parquet
         output_file = DATA_DIR / f"pit_stops_{start_year}_{end_year}.parquet"
-        final_df.to_parquet(output_file, index=False)
+        final_df.to_parquet(output_file, index=False, compression='zstd', use_dictionary=True)
         logger.info(f"Saved {len(final_df)} rows to {output_file}")
         
         # Calculate Team Efficiency
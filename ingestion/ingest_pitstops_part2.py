@@ -1,57 +1,58 @@
+import asyncio
 import requests
 import pandas as pd
 import logging
 import time
 import random
-from pathlib import Path
+from collections import defaultdict
+from ingestion.jolpica import API_BASE, DATA_DIR, get_session, loads, season_expire_after, append_stops, save_season, season_path, is_final_season
+from aiolimiter import AsyncLimiter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-API_BASE = "https://api.jolpi.ca/ergast/f1"
-DATA_DIR = Path("data/strategy")
-
 def fetch_pitstops(start_year: int, end_year: int):
     DATA_DIR.mkdir(parents=True, exist_ok=True)
+    session = get_session()
     all_seasons = []
 
     for season in range(start_year, end_year + 1):
         logger.info(f"Starting Season {season}...")
-        
-        # Friendly delay before starting a season
-        time.sleep(random.uniform(5.0, 10.0))
+        expire_after = season_expire_after(season)
         
         # Get schedule
         try:
             schedule_url = f"{API_BASE}/{season}.json"
-            resp = requests.get(schedule_url, timeout=20)
+            resp = session.get(schedule_url, timeout=20, expire_after=expire_after)
             if resp.status_code == 429:
                 logger.warning("Hit 429 on schedule. Sleeping 60s...")
                 time.sleep(60)
-                resp = requests.get(schedule_url, timeout=20)
+                resp = session.get(schedule_url, timeout=20, expire_after=expire_after)
             
             resp.raise_for_status()
-            total_rounds = int(resp.json()['MRData']['RaceTable']['Races'][-1]['round'])
+            total_rounds = int(loads(resp.content)['MRData']['RaceTable']['Races'][-1]['round'])
             logger.info(f"Season {season}: {total_rounds} rounds.")
         except Exception as e:
             logger.error(f"Failed to fetch schedule for {season}: {e}")
             continue
 
-        season_stops = []
+        # Friendly delay before starting a season (not needed when the schedule came from cache)
+        if not resp.from_cache:
+            time.sleep(random.uniform(5.0, 10.0))
+
+        cols = defaultdict(list)
         
         for r in range(1, total_rounds + 1):
-            # HUMANISTIC DELAY: 5 to 15 seconds between requests
-            delay = random.uniform(5.0, 15.0)
-            logger.info(f"Fetching {season} R{r}... (sleeping {delay:.1f}s)")
-            time.sleep(delay)
-            
+            logger.info(f"Fetching {season} R{r}...")
             url = f"{API_BASE}/{season}/{r}/pitstops.json?limit=100"
+            from_cache = False
             
             # Retry loop with long backoff
             for attempt in range(5):
                 try:
-                    resp = requests.get(url, timeout=20)
+                    resp = session.get(url, timeout=20, expire_after=expire_after)
+                    from_cache = resp.from_cache
                     if resp.status_code == 429:
                         wait = (2 ** attempt) * 10 + random.uniform(0, 5)
                         logger.warning(f"429 at {season} R{r}. Backing off for {wait:.1f}s")
@@ -59,55 +60,114 @@ def fetch_pitstops(start_year: int, end_year: int):
                         continue
                     
                     resp.raise_for_status()
-                    race_data = resp.json()['MRData']['RaceTable']['Races']
+                    race_data = loads(resp.content)['MRData']['RaceTable']['Races']
                     
                     if race_data:
-                        race = race_data[0]
-                        race_name = race['raceName']
-                        date = race['date']
-                        
-                        if 'PitStops' in race:
-                            for stop in race['PitStops']:
-                                row = {
-                                    'season': season,
-                                    'round': r,
-                                    'race_name': race_name,
-                                    'date': date,
-                                    'driver_id': stop['driverId'],
-                                    'lap': int(stop['lap']),
-                                    'stop_number': int(stop['stop']),
-                                    'time': stop['time'],
-                                    'duration_str': stop['duration']
-                                }
-                                # Parse duration
-                                if 'milliseconds' in stop:
-                                     try: row['duration'] = int(stop['milliseconds']) / 1000.0
-                                     except: row['duration'] = None
-                                else:
-                                    try: 
-                                        d = stop['duration']
-                                        if ':' in d:
-                                            p = d.split(':')
-                                            row['duration'] = float(p[0])*60 + float(p[1])
-                                        else: row['duration'] = float(d)
-                                    except: row['duration'] = None
-                                    
-                                season_stops.append(row)
+                        append_stops(cols, season, r, race_data[0])
                     break # Success
                 except Exception as e:
                     logger.error(f"Error {season} R{r}: {e}")
                     time.sleep(5)
             
+            # HUMANISTIC DELAY: 5 to 15 seconds between network requests, skipped for cache hits
+            if not from_cache:
+                delay = random.uniform(5.0, 15.0)
+                logger.info(f"Sleeping {delay:.1f}s...")
+                time.sleep(delay)
+            
         # Save per season to be safe
-        if season_stops:
-            df = pd.DataFrame(season_stops)
-            path = DATA_DIR / f"pitstops_{season}.parquet"
-            df.to_parquet(path, index=False)
-            logger.info(f"Saved {len(df)} stops for {season} to {path}")
+        if cols:
+            df = save_season(cols, season)
             all_seasons.append(df)
 
+async def _get_json(limiter: AsyncLimiter, url: str, label: str, expire_after):
+    """
+    GET a JSON payload through the cached Jolpica session (see jolpica.get_session), off the event loop.
+    Fresh cache hits return at once; only real requests (including ETag revalidations) wait on the
+    shared rate limiter. 429s and request errors back off exponentially; returns None once retries
+    are exhausted.
+    """
+    session = get_session()
+    resp = await asyncio.to_thread(session.get, url, expire_after=expire_after, only_if_cached=True)
+    if resp.status_code == 200:
+        return loads(resp.content)
+
+    for attempt in range(5):
+        try:
+            async with limiter:
+                resp = await asyncio.to_thread(session.get, url, timeout=20, expire_after=expire_after)
+            if resp.status_code != 429:
+                resp.raise_for_status()
+                return loads(resp.content)
+            logger.warning(f"429 at {label}. Backing off for {2 ** attempt}s")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Error {label}: {e}")
+        await asyncio.sleep(2 ** attempt)
+
+    logger.error(f"Failed to fetch {label} after retries.")
+    return None
+
+async def _fetch_season(limiter: AsyncLimiter, season: int) -> int:
+    """
+    Fetch every round of one season concurrently and write pitstops_{season}.parquet as soon as they finish.
+    A season with any round still failing after retries is not written, so a partial file never
+    replaces (or poses as) a complete one. Returns the number of stops saved.
+    """
+    expire_after = season_expire_after(season)
+    schedule = await _get_json(limiter, f"{API_BASE}/{season}.json", f"schedule {season}", expire_after)
+    races = schedule['MRData']['RaceTable']['Races'] if schedule else []
+    if not races:
+        logger.error(f"Failed to fetch schedule for {season}")
+        return 0
+    total_rounds = int(races[-1]['round'])
+    logger.info(f"Season {season}: {total_rounds} rounds.")
+
+    payloads = await asyncio.gather(
+        *[
+            _get_json(limiter, f"{API_BASE}/{season}/{r}/pitstops.json?limit=100", f"{season} R{r}", expire_after)
+            for r in range(1, total_rounds + 1)
+        ]
+    )
+
+    missing = [r for r, payload in enumerate(payloads, start=1) if payload is None]
+    if missing:
+        logger.error(f"Season {season}: rounds {missing} failed. Not saving a partial season.")
+        return 0
+
+    cols = defaultdict(list)
+    for r, payload in enumerate(payloads, start=1):
+        race_data = payload['MRData']['RaceTable']['Races']
+        if race_data:
+            append_stops(cols, season, r, race_data[0])
+    if not cols:
+        return 0
+
+    # Encode off the event loop so the other seasons keep downloading
+    df = await asyncio.to_thread(save_season, cols, season)
+    return len(df)
+
+async def fetch_pitstops_async(start_year: int, end_year: int, rps: float = 2.0) -> int:
+    """
+    Concurrent variant of fetch_pitstops, sharing its HTTP cache.
+    All rounds are requested in flight together; the AsyncLimiter keeps us under `rps` requests/second
+    instead of sleeping between requests. Each season is saved as soon as its own rounds finish, and
+    finished seasons that already have a pitstops_{season}.parquet are skipped, so an interrupted run
+    picks up where it stopped. Returns the number of stops saved.
+    """
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    seasons = []
+    for season in range(start_year, end_year + 1):
+        if is_final_season(season) and season_path(season).exists():
+            logger.info(f"Season {season} already saved to {season_path(season)}. Skipping.")
+            continue
+        seasons.append(season)
+
+    limiter = AsyncLimiter(max_rate=rps, time_period=1)
+    saved = await asyncio.gather(*[_fetch_season(limiter, season) for season in seasons])
+    return sum(saved)
+
 if __name__ == "__main__":
     # Part 2: 2020 to 2025
     logger.info("Starting Part 2 Ingestion (2020-2025). This will take a while.")
-    fetch_pitstops(2020, 2025)
+    asyncio.run(fetch_pitstops_async(2020, 2025))
     logger.info("Part 2 Complete.")
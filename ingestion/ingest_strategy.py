@@ -1,9 +1,23 @@
-import requests
+import asyncio
+import aiohttp
+import sqlite3
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import logging
-import time
+from aiolimiter import AsyncLimiter
+from collections import defaultdict
+from datetime import datetime
 from pathlib import Path
 
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    import json
+    loads = json.loads
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -12,23 +26,134 @@ logger = logging.getLogger(__name__)
 API_BASE = "https://api.jolpi.ca/ergast/f1"
 DATA_DIR = Path("data/strategy")
 
-def fetch_results(season: int) -> pd.DataFrame:
+# Requests allowed in flight at once, and the sustained rate Jolpica tolerates (requests/second)
+MAX_CONCURRENCY = 10
+REQUESTS_PER_SECOND = 4
+
+# Transient statuses worth retrying (as are dropped connections and timeouts); backoff is BACKOFF_FACTOR * 2**attempt seconds
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.3
+
+# Payloads of completed seasons never change, so they are kept on disk and re-runs skip the network
+CACHE_DB = DATA_DIR / ".results_cache.sqlite"
+_cache = None
+
+def _cache_connection() -> sqlite3.Connection:
+    global _cache
+    if _cache is None:
+        CACHE_DB.parent.mkdir(parents=True, exist_ok=True)
+        _cache = sqlite3.connect(CACHE_DB, isolation_level=None)
+        _cache.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, body BLOB NOT NULL)")
+    return _cache
+
+def _is_final(season: int) -> bool:
+    """Whether a season's results can no longer change (and may be cached forever)."""
+    return season < datetime.now().year
+
+async def _get_json(session: aiohttp.ClientSession, sem: asyncio.Semaphore, limiter: AsyncLimiter, url: str, cache: bool = False):
+    """
+    GET a JSON payload through the shared concurrency/rate limits.
+    Transient statuses, connection errors and timeouts are retried with exponential backoff;
+    other errors, or a transient one on the last attempt, raise.
+    With `cache`, the raw body is served from / stored in CACHE_DB.
+    """
+    if cache:
+        row = _cache_connection().execute("SELECT body FROM responses WHERE url = ?", (url,)).fetchone()
+        if row:
+            return loads(row[0])
+
+    for attempt in range(MAX_RETRIES):
+        last_attempt = attempt == MAX_RETRIES - 1
+        try:
+            async with sem, limiter:
+                async with session.get(url) as resp:
+                    if resp.status not in RETRY_STATUSES or last_attempt:
+                        resp.raise_for_status()
+                        body = await resp.read()
+                        break
+                    reason = f"HTTP {resp.status}"
+        except aiohttp.ClientResponseError:
+            # Non-transient status (raised by raise_for_status above)
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if last_attempt:
+                raise
+            reason = f"{type(e).__name__} {e}"
+        delay = BACKOFF_FACTOR * 2 ** attempt
+        logger.warning(f"{reason} for {url}. Retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    data = loads(body)
+    if cache:
+        _cache_connection().execute("INSERT OR REPLACE INTO responses VALUES (?, ?)", (url, body))
+    return data
+
+# Low-cardinality strings; stored as categories so Parquet dictionary-encodes them
+CATEGORY_COLUMNS = ['driver_id', 'constructor_id', 'circuit_id', 'status', 'race_name']
+
+# Fixed on-disk schema, so every season's partition agrees (e.g. a season with no driver codes at all)
+_category = pa.dictionary(pa.int32(), pa.string())
+RESULTS_SCHEMA = pa.schema([
+    ('season', pa.int16()), ('round', pa.int8()), ('race_name', _category), ('date', pa.string()),
+    ('circuit_id', _category), ('driver_id', _category), ('driver_code', pa.string()),
+    ('constructor_id', _category), ('grid_position', pa.int64()), ('finish_position_text', pa.string()),
+    ('finish_position', pa.float64()), ('points', pa.float64()), ('status', _category),
+    ('position_change', pa.float64()),
+])
+
+RESULT_COLUMNS = (
+    'season', 'round', 'race_name', 'date', 'circuit_id', 'driver_id', 'driver_code',
+    'constructor_id', 'grid_position', 'finish_position_text', 'finish_position', 'points', 'status',
+)
+
+def _append_results(cols: dict, season: int, r: int, race: dict):
+    """Append one entry per classified driver in a Jolpica race payload to the column lists in `cols`."""
+    circuit_id = race['Circuit']['circuitId']
+    date = race['date']
+    race_name = race['raceName']
+    for result in race['Results']:
+        # Read every field before appending so a malformed result can't leave the columns ragged
+        values = (
+            season, r, race_name, date, circuit_id,
+            result['Driver']['driverId'], result['Driver'].get('code'),
+            result['Constructor']['constructorId'],
+            int(result['grid']),
+            result['positionText'], # R, D, or number
+            result['position'], # parsed to numbers in one pass once the season is assembled
+            float(result['points']),
+            result['status'],
+        )
+        for col, value in zip(RESULT_COLUMNS, values):
+            cols[col].append(value)
+
+async def fetch_round(sem: asyncio.Semaphore, limiter: AsyncLimiter, session: aiohttp.ClientSession, season: int, r: int):
+    """
+    Fetch the race payload of a single round; None if the round has no results (yet).
+    Raises if the request failed.
+    """
+    try:
+        url = f"{API_BASE}/{season}/{r}/results.json"
+        data = await _get_json(session, sem, limiter, url, cache=_is_final(season))
+        race_data = data['MRData']['RaceTable']['Races']
+    except Exception as e:
+        logger.error(f"Error fetching {season} round {r}: {e}")
+        raise
+
+    return race_data[0] if race_data else None
+
+async def fetch_results(session: aiohttp.ClientSession, season: int, sem: asyncio.Semaphore, limiter: AsyncLimiter) -> pd.DataFrame:
     """
     Fetch all race results for a given season using the Ergast API (via Jolpica).
-    Pagination is handled by iterating rounds, or fetching season full list?
-    Ergast season endpoint: /2023/results.json usually returns only limited per-page.
-    Limit is usually 30. Races have ~20 drivers * 24 races = 480 rows.
-    We can fetch limits=1000 to get whole season? No, usually limit applies to 'races'.
-    Let's iterate rounds for safety.
+    The season endpoint paginates results, so we fetch the schedule and then every round.
+    Rounds are requested concurrently; `sem` bounds the requests in flight and
+    `limiter` keeps the overall rate polite, replacing the old fixed sleep between rounds.
+    A season with any round that failed to download or parse comes back empty, so a partial
+    season never replaces a complete one on disk.
     """
-    results_list = []
-    
     # Get schedule first to know how many rounds
     try:
-        schedule_url = f"{API_BASE}/{season}.json"
-        resp = requests.get(schedule_url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        data = await _get_json(session, sem, limiter, f"{API_BASE}/{season}.json", cache=_is_final(season))
         total_rounds = int(data['MRData']['RaceTable']['Races'][-1]['round'])
     except Exception as e:
         logger.error(f"Failed to fetch schedule for {season}: {e}")
@@ -36,81 +161,111 @@ def fetch_results(season: int) -> pd.DataFrame:
 
     logger.info(f"Season {season}: {total_rounds} rounds detected.")
 
-    for r in range(1, total_rounds + 1):
+    races = await asyncio.gather(
+        *[fetch_round(sem, limiter, session, season, r) for r in range(1, total_rounds + 1)],
+        return_exceptions=True,
+    )
+
+    # One list per column, filled in round order (gather preserves it)
+    cols = defaultdict(list)
+    failed = [r for r, race in enumerate(races, start=1) if isinstance(race, Exception)]
+    for r, race in enumerate(races, start=1):
+        if race is None or r in failed:
+            continue
         try:
-            url = f"{API_BASE}/{season}/{r}/results.json"
-            resp = requests.get(url, timeout=10)
-            resp.raise_for_status()
-            race_data = resp.json()['MRData']['RaceTable']['Races']
-            
-            if not race_data:
+            _append_results(cols, season, r, race)
+        except (KeyError, ValueError) as e:
+            logger.error(f"Error parsing {season} round {r}: {e}")
+            failed.append(r)
+
+    if failed:
+        logger.error(f"Season {season}: rounds {sorted(failed)} failed. Not writing a partial season.")
+        return pd.DataFrame()
+
+    if not cols:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(cols)
+    # "R", "D", "W"... are not finishing positions
+    df['finish_position'] = pd.to_numeric(df['finish_position'], errors='coerce')
+
+    # Calculate Delta (pit-lane starts have grid 0 and no meaningful change)
+    gp = df['grid_position'].to_numpy()
+    fp = df['finish_position'].to_numpy()
+    df['position_change'] = np.where((fp > 0) & (gp > 0), gp - fp, np.nan)
+
+    return df.astype({'season': 'int16', 'round': 'int8', **dict.fromkeys(CATEGORY_COLUMNS, 'category')})
+
+def _write_season(df: pd.DataFrame, output_dir: Path):
+    """
+    Write one season as its partition of the race results dataset.
+    delete_matching replaces the partition of a re-fetched season instead of adding duplicate files.
+    """
+    pq.write_to_dataset(
+        pa.Table.from_pandas(df, schema=RESULTS_SCHEMA, preserve_index=False),
+        root_path=output_dir,
+        partition_cols=['season'],
+        existing_data_behavior='delete_matching',
+        compression='zstd',
+        compression_level=3,
+        use_dictionary=True,
+        data_page_size=1 << 20,
+        row_group_size=128_000,
+    )
+
+async def fetch_all_seasons(start_year: int, end_year: int, output_dir: Path) -> int:
+    """
+    Fetch every season concurrently over one shared connection pool.
+    Each season is written to `output_dir` as soon as it completes, so only
+    seasons still in flight are held in memory. Returns the number of rows saved.
+    """
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    limiter = AsyncLimiter(REQUESTS_PER_SECOND, 1)
+    # One pooled session: keep-alive reuses the TLS connection across rounds and seasons
+    connector = aiohttp.TCPConnector(limit=20, limit_per_host=10, keepalive_timeout=60)
+
+    saved = 0
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10)) as session:
+        tasks = [fetch_results(session, year, sem, limiter) for year in range(start_year, end_year + 1)]
+        for next_season in asyncio.as_completed(tasks):
+            df = await next_season
+            if df.empty:
                 continue
-                
-            race = race_data[0] # The race object
-            circuit = race['Circuit']
-            date = race['date']
-            race_name = race['raceName']
-            
-            for result in race['Results']:
-                # Extract relevant fields
-                row = {
-                    'season': season,
-                    'round': r,
-                    'race_name': race_name,
-                    'date': date,
-                    'circuit_id': circuit['circuitId'],
-                    'driver_id': result['Driver']['driverId'],
-                    'driver_code': result['Driver'].get('code'),
-                    'constructor_id': result['Constructor']['constructorId'],
-                    'grid_position': int(result['grid']),
-                    'finish_position_text': result['positionText'], # R, D, or number
-                    'finish_position': int(result['position']) if result['position'].isdigit() else None,
-                    'points': float(result['points']),
-                    'status': result['status']
-                }
-                
-                # Calculate Delta
-                if row['finish_position'] and row['grid_position'] > 0:
-                     row['position_change'] = row['grid_position'] - row['finish_position']
-                else:
-                     row['position_change'] = None
-                     
-                results_list.append(row)
-                
-            # Be nice to the API
-            time.sleep(0.2)
-            
-        except Exception as e:
-            logger.error(f"Error fetching {season} round {r}: {e}")
-            
-    return pd.DataFrame(results_list)
+            # Encode off the event loop so the other seasons keep downloading
+            await asyncio.to_thread(_write_season, df, output_dir)
+            saved += len(df)
+    return saved
 
 def main():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     
-    all_seasons = []
-    
     # 2014 to 2024 (or later)
     # Adjust range as needed.
     start_year = 2014
     end_year = 2025 # Include 2025 if new season started? Assuming current date is Jan 2026, 2025 is complete.
     
-    for year in range(start_year, end_year + 1):
-        logger.info(f"Processing season {year}...")
-        df = fetch_results(year)
-        if not df.empty:
-            all_seasons.append(df)
+    # Parquet dataset partitioned by season, so readers filtering on season only open those files.
+    # It keeps the old single-file name; pd.read_parquet / pq.read_table read the directory the same way.
+    output_dir = DATA_DIR / f"race_results_{start_year}_{end_year}.parquet"
+    if output_dir.is_file():
+        legacy = output_dir.with_suffix(".legacy.parquet")
+        logger.warning(f"Moving single-file results {output_dir} to {legacy} to make room for the dataset.")
+        output_dir.rename(legacy)
+    
+    logger.info(f"Processing seasons {start_year}-{end_year}...")
+    saved = asyncio.run(fetch_all_seasons(start_year, end_year, output_dir))
             
-    if all_seasons:
-        final_df = pd.concat(all_seasons, ignore_index=True)
-        # Parquet for efficiency
-        output_file = DATA_DIR / f"race_results_{start_year}_{end_year}.parquet"
-        final_df.to_parquet(output_file, index=False)
-        logger.info(f"Saved {len(final_df)} rows to {output_file}")
+    if saved:
+        logger.info(f"Saved {saved} rows to {output_dir}")
         
-        # Calculate Grid Conversion Probability
+        # Calculate Grid Conversion Probability (only the two columns it needs are read back)
         logger.info("Calculating Grid Conversion Metrics...")
-        analyze_grid_conversion(final_df)
+        results = pq.read_table(
+            output_dir,
+            columns=['grid_position', 'position_change'],
+            filters=[('season', '>=', start_year), ('season', '<=', end_year)],
+        ).to_pandas()
+        analyze_grid_conversion(results)
     else:
         logger.warning("No data fetched.")
 
@@ -122,19 +277,24 @@ def analyze_grid_conversion(df: pd.DataFrame):
     valid_df = df.dropna(subset=['position_change', 'grid_position'])
     valid_df = valid_df[valid_df['grid_position'] > 0] # Pit starts usually 0 or handled elsewhere
     
-    stats = valid_df.groupby('grid_position')['position_change'].agg(
-        count='count',
-        mean_change='mean',
-        prob_gain=lambda x: (x > 0).mean(),
-        prob_loss=lambda x: (x < 0).mean()
+    # Gain/loss flags as columns so every reduction is a built-in (no per-group Python lambdas)
+    valid_df = valid_df.assign(
+        gain=(valid_df['position_change'] > 0).astype('int8'),
+        loss=(valid_df['position_change'] < 0).astype('int8'),
+    )
+    stats = valid_df.groupby('grid_position', observed=True).agg(
+        count=('position_change', 'size'),
+        mean_change=('position_change', 'mean'),
+        prob_gain=('gain', 'mean'),
+        prob_loss=('loss', 'mean'),
     ).reset_index()
     
     # Print formatted
     logger.info("Grid Conversion Stats (2014-Present):")
     print(stats.to_string(index=False))
     
-    # Save stats
-    stats.to_csv(DATA_DIR / "grid_conversion_stats.csv", index=False)
+    # Save stats (Parquet keeps the dtypes a CSV would lose)
+    stats.to_parquet(DATA_DIR / "grid_conversion_stats.parquet", index=False, compression='zstd')
 
 if __name__ == "__main__":
     main()
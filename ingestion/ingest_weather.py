@@ -1,5 +1,7 @@
 import logging
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from ingestion.client import OpenF1Client
 
 logger = logging.getLogger(__name__)
@@ -21,8 +23,10 @@ async def fetch_weather(client: OpenF1Client, session_key: int) -> pd.DataFrame:
     df = pd.DataFrame(data)
     
     # Standardize timestamp
+    # Arrow's vectorized ISO8601 cast copes with the mixed fractional-second precision OpenF1 returns
     if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'], format='ISO8601')
+        dates = pc.cast(pa.array(df['date'], type=pa.string()), pa.timestamp('us', tz='UTC'))
+        df['date'] = dates.to_pandas()
         
     logger.info(f"Fetched {len(df)} weather records for session {session_key}")
     return df
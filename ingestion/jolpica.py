@@ -0,0 +1,108 @@
+import requests_cache
+from requests.adapters import HTTPAdapter
+import pandas as pd
+import numpy as np
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    import json
+    loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+# Jolpica / Ergast API Base
+API_BASE = "https://api.jolpi.ca/ergast/f1"
+DATA_DIR = Path("data/strategy")
+HEADERS = {"Accept": "application/json", "User-Agent": "f1-da/1.0"}
+
+# Cache lifetime for the in-progress season; past seasons never change and never expire
+CACHE_EXPIRE_AFTER = timedelta(days=30)
+
+_session = None
+
+def get_session() -> requests_cache.CachedSession:
+    """
+    One pooled session for every call so keep-alive reuses the TLS connection across rounds.
+    Responses are cached on disk and revalidated with ETag/Last-Modified, so re-runs mostly hit the cache.
+    Created on first use, so importing this module touches neither the disk nor the network.
+    """
+    global _session
+    if _session is None:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        _session = requests_cache.CachedSession(
+            str(DATA_DIR / ".http_cache"),
+            backend="sqlite",
+            cache_control=True,
+            expire_after=CACHE_EXPIRE_AFTER,
+        )
+        _session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=0)
+        _session.mount("http://", adapter)
+        _session.mount("https://", adapter)
+    return _session
+
+def is_final_season(season: int) -> bool:
+    """Whether a season is over, so its data can no longer change."""
+    return season < datetime.now().year
+
+def season_expire_after(season: int):
+    """Cache expiry for a season's responses."""
+    if is_final_season(season):
+        return requests_cache.NEVER_EXPIRE
+    return CACHE_EXPIRE_AFTER
+
+def parse_durations(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized parsing of pit stop durations and integer fields, with compact dtypes for Parquet.
+    'milliseconds' is safest when present; otherwise 'duration' is "21.565" (seconds) or "1:02.123" (minutes:seconds).
+    """
+    if 'milliseconds' in df.columns:
+        ms = pd.to_numeric(df['milliseconds'], errors='coerce')
+    else:
+        ms = pd.Series(np.nan, index=df.index)
+
+    parts = df['duration_str'].str.split(':', n=1, expand=True).reindex(columns=[0, 1])
+    first = pd.to_numeric(parts[0], errors='coerce')
+    second = pd.to_numeric(parts[1], errors='coerce')
+    from_str = np.where(parts[1].notna(), first * 60 + second, first)
+
+    df['duration'] = np.where(ms.notna(), ms / 1000.0, from_str)
+    df['lap'] = pd.to_numeric(df['lap'], errors='coerce').astype('Int16')
+    df['stop_number'] = pd.to_numeric(df['stop_number'], errors='coerce').astype('Int16')
+    df[['season', 'round']] = df[['season', 'round']].astype('int16')
+    df[['driver_id', 'race_name']] = df[['driver_id', 'race_name']].astype('category')
+    return df.drop(columns=['milliseconds'], errors='ignore')
+
+STOP_COLUMNS = (
+    'season', 'round', 'race_name', 'date', 'driver_id',
+    'lap', 'stop_number', 'time', 'duration_str', 'milliseconds',
+)
+
+def append_stops(cols: dict, season: int, r: int, race: dict):
+    """Append one entry per pit stop in a Jolpica race payload to the column lists in `cols`."""
+    race_name = race['raceName']
+    date = race['date']
+    for stop in race.get('PitStops', []):
+        # Read every field before appending so a malformed stop can't leave the columns ragged
+        values = (
+            season, r, race_name, date, stop['driverId'],
+            stop['lap'], stop['stop'], stop['time'], stop['duration'], stop.get('milliseconds'),
+        )
+        for col, value in zip(STOP_COLUMNS, values):
+            cols[col].append(value)
+
+def season_path(season: int) -> Path:
+    return DATA_DIR / f"pitstops_{season}.parquet"
+
+def save_season(cols: dict, season: int) -> pd.DataFrame:
+    """Parse one season's pit stop columns and write them to pitstops_{season}.parquet."""
+    df = parse_durations(pd.DataFrame(cols))
+    path = season_path(season)
+    df.to_parquet(path, index=False, compression='zstd', use_dictionary=True)
+    logger.info(f"Saved {len(df)} stops for {season} to {path}")
+    return df
@@ -1,58 +1,80 @@
+import numpy as np
 import pandas as pd
 import logging
-from ingestion.cleaning import smooth_telemetry, calculate_tire_age_adjusted, calculate_interval_delta
+from pandas.api.extensions import take
+from ingestion.cleaning import calculate_tire_age_adjusted, calculate_interval_delta, shrink_dtypes, SMOOTH_COLS
+from ingestion.cleaning_kernels import interpolate_smooth
 
 logger = logging.getLogger(__name__)
 
+CONTINUOUS_COLS = ['speed', 'rpm', 'throttle', 'brake', 'drs']
+CATEGORICAL_COLS = ['gear']
+# Limit to ~2 seconds (approx 8 samples at 4Hz) to avoid filling large gaps
+INTERP_LIMIT = 8
+
+def _epoch_ns(dates: pd.Series) -> np.ndarray:
+    """Timestamps as int64 epoch nanoseconds (.values is the UTC datetime64 block, so no tz conversion)."""
+    return dates.values.astype('datetime64[ns]', copy=False).view('i8')
+
+def _asof_index(right_dates: pd.Series, left_dates: pd.Series) -> np.ndarray:
+    """
+    Row in the sorted `right_dates` at or before each of `left_dates`, or -1 if there is none.
+    Same matching rule as merge_asof(direction='backward'), as a single searchsorted.
+    """
+    return np.searchsorted(_epoch_ns(right_dates), _epoch_ns(left_dates), side='right') - 1
+
 def merge_data(car_df: pd.DataFrame, laps_df: pd.DataFrame, weather_df: pd.DataFrame) -> pd.DataFrame:
     """
-    Merges car data with laps and weather data using merge_asof.
+    Merges car data with laps and weather data using backward as-of matching.
     Assumes all DataFrames have a 'date' column in datetime64[ns].
     """
     if car_df.empty:
         logger.warning("Car dataframe is empty. Cannot merge.")
         return pd.DataFrame()
 
-    # Ensure timestamps are sorted (required for merge_asof)
-    car_df = car_df.sort_values('date')
+    # Ensure timestamps are sorted (required for the as-of match); ingested telemetry usually already is
+    if not car_df['date'].is_monotonic_increasing:
+        car_df = car_df.sort_values('date')
     
     if not laps_df.empty:
-        laps_merge = laps_df.sort_values('date_start').rename(columns={'date_start': 'date'})
-        
         # Select columns to merge
         # Ensure we keep 'stnt' (stint) for tire age calc
-        cols_to_merge = ['date', 'lap_number', 'is_pit_out_lap']
-        cols_to_merge = [c for c in cols_to_merge if c in laps_merge.columns]
-        laps_merge = laps_merge[cols_to_merge]
+        cols_to_merge = ['lap_number', 'is_pit_out_lap']
+        cols_to_merge = [c for c in cols_to_merge if c in laps_df.columns]
         
-        merged_df = pd.merge_asof(
-            car_df, 
-            laps_merge, 
-            on='date', 
-            direction='backward'
-        )
+        # Laps without a start time can't be matched to telemetry
+        laps_merge = laps_df[['date_start'] + cols_to_merge].dropna(subset=['date_start']).sort_values('date_start')
+        
+        # Each car sample takes the last lap that started at or before it.
+        # take() with allow_fill gives merge_asof's NaN (and upcast) for samples before the first lap.
+        idx = _asof_index(laps_merge['date_start'], car_df['date'])
+        merged_df = car_df.reset_index(drop=True)
+        for col in cols_to_merge:
+            merged_df[col] = take(laps_merge[col].to_numpy(), idx, allow_fill=True)
     else:
-        merged_df = car_df
+        merged_df = car_df.reset_index(drop=True)
         
     if not weather_df.empty:
-        weather_df = weather_df.sort_values('date')
-        w_cols = ['date', 'air_temperature', 'track_temperature', 'humidity', 'rainfall']
+        w_cols = ['air_temperature', 'track_temperature', 'humidity', 'rainfall']
         w_cols = [c for c in w_cols if c in weather_df.columns]
-        weather_merge = weather_df[w_cols]
-        # Rename weather date to preserve it
-        weather_merge = weather_merge.rename(columns={'date': 'weather_date'})
+        # Only ~1 weather sample/minute: sort the small lookup table (if needed), not the telemetry
+        weather_merge = weather_df[['date'] + w_cols]
+        if not weather_merge['date'].is_monotonic_increasing:
+            weather_merge = weather_merge.sort_values('date')
         
-        merged_df = pd.merge_asof(
-            merged_df,
-            weather_merge,
-            left_on='date',
-            right_on='weather_date',
-            direction='backward'
-        )
+        idx = _asof_index(weather_merge['date'], merged_df['date'])
+        # Keep the weather timestamp to measure staleness
+        weather_cols = {'weather_date': take(weather_merge['date'].array, idx, allow_fill=True)}
+        for col in w_cols:
+            weather_cols[col] = take(weather_merge[col].to_numpy(), idx, allow_fill=True)
         
         # Flag stale weather (> 5 mins = 300s)
-        merged_df['weather_age_sec'] = (merged_df['date'] - merged_df['weather_date']).dt.total_seconds()
-        merged_df['weather_stale'] = merged_df['weather_age_sec'] > 300
+        age_ns = _epoch_ns(merged_df['date']) - _epoch_ns(weather_merge['date'])[idx]
+        weather_cols['weather_age_sec'] = np.where(idx >= 0, age_ns / 1e9, np.nan)
+        weather_cols['weather_stale'] = weather_cols['weather_age_sec'] > 300
+        
+        # Attach all weather columns in one concat instead of one insert per column
+        merged_df = pd.concat([merged_df, pd.DataFrame(weather_cols, index=merged_df.index)], axis=1)
         
     return merged_df
 
@@ -60,22 +82,47 @@ def interpolate_missing(df: pd.DataFrame) -> pd.DataFrame:
     """
     Interpolate missing values for continuous variables.
     """
-    continuous_cols = ['speed', 'rpm', 'throttle', 'brake', 'drs'] 
-    categorical_cols = ['gear'] 
-    
-    continuous_cols = [c for c in continuous_cols if c in df.columns]
-    categorical_cols = [c for c in categorical_cols if c in df.columns]
+    continuous_cols = [c for c in CONTINUOUS_COLS if c in df.columns]
+    categorical_cols = [c for c in CATEGORICAL_COLS if c in df.columns]
     
     # Interpolate continuous
-    # Limit to ~2 seconds (approx 8 samples at 4Hz) to avoid filling large gaps
     if continuous_cols:
-        df[continuous_cols] = df[continuous_cols].interpolate(method='linear', limit=8, limit_direction='both')
+        df[continuous_cols] = df[continuous_cols].interpolate(method='linear', limit=INTERP_LIMIT, limit_direction='both')
         
     if categorical_cols:
          df[categorical_cols] = df[categorical_cols].ffill()
          
     return df
 
+def interpolate_and_smooth(df: pd.DataFrame, window_length: int = 11, polyorder: int = 3) -> pd.DataFrame:
+    """
+    interpolate_missing followed by smooth_telemetry, fused: the continuous channels are
+    pulled out as one float32 block, interpolated and SG-smoothed column by column in a
+    single compiled pass, and written back once.
+    """
+    continuous_cols = [c for c in CONTINUOUS_COLS if c in df.columns]
+    categorical_cols = [c for c in CATEGORICAL_COLS if c in df.columns]
+    
+    if categorical_cols:
+         df[categorical_cols] = df[categorical_cols].ffill()
+    
+    # SMOOTH_COLS is a subset of CONTINUOUS_COLS, so without continuous channels there is nothing to smooth either
+    if not continuous_cols:
+        return df
+    
+    smooth_cols = [c for c in SMOOTH_COLS if c in continuous_cols]
+    interpolated, smoothed = interpolate_smooth(
+        df[continuous_cols].to_numpy(dtype=np.float32),
+        [continuous_cols.index(c) for c in smooth_cols],
+        limit=INTERP_LIMIT,
+        window_length=window_length,
+        polyorder=polyorder,
+    )
+    df[continuous_cols] = interpolated
+    if smooth_cols:
+        df[[f'{c}_smooth' for c in smooth_cols]] = smoothed
+    return df
+
 def process_features(car_df: pd.DataFrame, laps_df: pd.DataFrame, weather_df: pd.DataFrame) -> pd.DataFrame:
     """
     Orchestrate the full Feature Engineering pipeline:
@@ -87,11 +134,11 @@ def process_features(car_df: pd.DataFrame, laps_df: pd.DataFrame, weather_df: pd
     if df.empty:
         return df
 
-    # 2. Interpolate
-    df = interpolate_missing(df)
-    
-    # 3. Smooth Telemetry
-    df = smooth_telemetry(df)
+    # Everything downstream is memory-bound, so work on the narrow dtypes
+    df = shrink_dtypes(df)
+
+    # 2. Interpolate + 3. Smooth Telemetry (one fused pass)
+    df = interpolate_and_smooth(df)
     
     # 4. Feature Creation
     df = calculate_tire_age_adjusted(df)
@@ -1,4 +1,5 @@
 import logging
+from operator import itemgetter
 from typing import List, Dict
 from ingestion.client import OpenF1Client
 
@@ -8,16 +9,17 @@ class SessionManager:
     def __init__(self, client: OpenF1Client):
         self.client = client
 
-    async def get_sessions(self, year: int = 2024, type: str = None) -> List[Dict]:
+    async def get_sessions(self, year: int = 2024, type: str = None, **filters) -> List[Dict]:
         """
         Fetch sessions for a given year.
-        Optionally filter by type (e.g., 'Race', 'Qualifying').
+        Optionally filter by type (e.g., 'Race', 'Qualifying') and any other OpenF1
+        session field (e.g., country_name='Monaco'); filtering happens server-side,
+        so only matching sessions are downloaded and parsed.
         """
-        params = {"year": year}
-        data = await self.client.fetch("sessions", params=params)
-        
+        params = {"year": year, **filters}
         if type:
-            data = [s for s in data if s.get("session_name") == type]
+            params["session_name"] = type
+        data = await self.client.fetch("sessions", params=params)
             
         logger.info(f"Found {len(data)} sessions for year {year}")
         return data
@@ -33,6 +35,5 @@ class SessionManager:
         if not sessions:
             return None
         
-        # sort by date_start explicitly to be sure
-        sessions.sort(key=lambda x: x['date_start'])
-        return sessions[-1]['session_key']
+        # Latest by date_start (ISO strings compare chronologically); a linear max, no sort
+        return max(sessions, key=itemgetter('date_start'))['session_key']
@@ -0,0 +1,106 @@
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Set
+
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2).encode()
+
+STATE_DB = Path("data/raw/state.sqlite")
+
+# driver_number stored for session-level kinds ('laps', 'weather').
+# SQLite treats NULLs in a primary key as distinct, so a sentinel keeps those rows unique.
+SESSION_LEVEL = -1
+
+_conn = None
+
+def _connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        STATE_DB.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(STATE_DB, isolation_level=None)
+        # WAL: each checkpoint is a cheap single-row append, never a rewrite of the whole history
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ingested (
+                session_key INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                driver_number INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                PRIMARY KEY (session_key, kind, driver_number)
+            )
+            """
+        )
+    return _conn
+
+def mark(session_key: int, kind: str, driver: int = None):
+    """Record that `kind` ('laps', 'weather', 'car') was ingested for a session (and driver)."""
+    driver_number = SESSION_LEVEL if driver is None else int(driver)
+    _connection().execute(
+        "INSERT OR REPLACE INTO ingested VALUES (?, ?, ?, ?)",
+        (int(session_key), kind, driver_number, int(time.time())),
+    )
+
+def is_done(session_key: int, kind: str, driver: int = None) -> bool:
+    driver_number = SESSION_LEVEL if driver is None else int(driver)
+    row = _connection().execute(
+        "SELECT 1 FROM ingested WHERE session_key = ? AND kind = ? AND driver_number = ?",
+        (int(session_key), kind, driver_number),
+    ).fetchone()
+    return row is not None
+
+def done_drivers(session_key: int, kind: str = "car") -> Set[int]:
+    rows = _connection().execute(
+        "SELECT driver_number FROM ingested WHERE session_key = ? AND kind = ?",
+        (int(session_key), kind),
+    ).fetchall()
+    return {r[0] for r in rows}
+
+def import_json(path: Path):
+    """
+    Seed an empty checkpoint table from the legacy JSON state file
+    ({session_key: {"laps": bool, "weather": bool, "drivers": [...]}}).
+    """
+    conn = _connection()
+    if not path.exists() or conn.execute("SELECT 1 FROM ingested LIMIT 1").fetchone():
+        return
+
+    try:
+        legacy = json.loads(path.read_text())
+    except Exception:
+        return
+
+    for session_key, session_state in legacy.items():
+        for kind in ("laps", "weather"):
+            if session_state.get(kind):
+                mark(session_key, kind)
+        for driver in session_state.get("drivers", []):
+            mark(session_key, "car", driver)
+
+def snapshot(path: Path):
+    """Write the checkpoints as the legacy-shaped JSON file, for human inspection."""
+    state = {}
+    rows = _connection().execute(
+        "SELECT session_key, kind, driver_number FROM ingested ORDER BY session_key, kind, ts"
+    ).fetchall()
+    for session_key, kind, driver_number in rows:
+        session_state = state.setdefault(str(session_key), {"laps": False, "weather": False, "drivers": []})
+        if kind == "car":
+            session_state["drivers"].append(driver_number)
+        else:
+            session_state[kind] = True
+
+    # Write to a temp file and swap it in, so a crash mid-write can't leave a torn file
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_bytes(_dumps(state))
+    os.replace(tmp, path)
@@ -0,0 +1,53 @@
+import numpy as np
+from numba import njit
+
+@njit(cache=True)
+def tire_hazard(driver, stint, circuit, compound, age, lap_time, n_circuits, n_compounds, max_age):
+    """
+    One pass over laps sorted by (driver, stint, lap_number) that fuses the stint rolling pace,
+    the failure flag and the per-(circuit, compound, age) counts.
+
+    A lap is a failure when it is > 1.5s slower than the mean of the non-NaN lap times among
+    the previous 3 laps (rows) of its stint, i.e. shift(1).rolling(3, min_periods=1).mean().
+    The window never reaches further back to replace a NaN lap. Codes of -1 mark missing keys
+    (pd.factorize); ages are only counted when they are whole numbers in 1..max_age.
+
+    Returns (n_laps, n_failures) indexed [circuit, compound, age], and the oldest age seen
+    per [circuit, compound] (NaN if none).
+    """
+    n = np.zeros((n_circuits, n_compounds, max_age + 1), dtype=np.int64)
+    f = np.zeros((n_circuits, n_compounds, max_age + 1), dtype=np.int64)
+    oldest = np.full((n_circuits, n_compounds), np.nan)
+
+    # Last 3 lap times of the current stint (NaN = empty slot)
+    window = np.full(3, np.nan)
+    pos = 0
+    for i in range(driver.shape[0]):
+        if i == 0 or driver[i] != driver[i - 1] or stint[i] != stint[i - 1]:
+            window[:] = np.nan
+            pos = 0
+
+        failed = False
+        if driver[i] >= 0 and stint[i] >= 0:
+            total = 0.0
+            count = 0
+            for k in range(3):
+                if not np.isnan(window[k]):
+                    total += window[k]
+                    count += 1
+            if count > 0 and lap_time[i] - total / count > 1.5:
+                failed = True
+            window[pos] = lap_time[i]
+            pos = (pos + 1) % 3
+
+        c, m, a = circuit[i], compound[i], age[i]
+        if c < 0 or m < 0 or np.isnan(a):
+            continue
+        if np.isnan(oldest[c, m]) or a > oldest[c, m]:
+            oldest[c, m] = a
+        if a >= 1 and a <= max_age and a == np.floor(a):
+            n[c, m, int(a)] += 1
+            if failed:
+                f[c, m, int(a)] += 1
+
+    return n, f, oldest
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 import logging
 from pathlib import Path
+from ingestion.cleaning import shrink_dtypes
+from ingestion.strategy_kernels import tire_hazard
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +19,11 @@ CIRCUIT_TYPES = {
     'bahrain': 'Balanced', 'austin': 'Balanced', 'interlagos': 'Balanced', 'yas_marina': 'Balanced', 'albert_park': 'Balanced'
 }
 
+# CIRCUIT_TYPES as an index of circuit ids plus a code -> type lookup array.
+# Unmapped circuits get code -1, which indexes the trailing 'Unknown'.
+CIRCUIT_IDS = pd.Index(list(CIRCUIT_TYPES))
+CIRCUIT_TYPE_LUT = np.array(list(CIRCUIT_TYPES.values()) + ['Unknown'], dtype=object)
+
 def calculate_team_efficiency(pit_df: pd.DataFrame) -> pd.DataFrame:
     """
     Calculate Team Efficiency Score based on pit stop durations.
@@ -25,17 +32,17 @@ def calculate_team_efficiency(pit_df: pd.DataFrame) -> pd.DataFrame:
     if pit_df.empty:
         return pd.DataFrame()
         
-    df = pit_df.copy()
-    
-    # Filter outliers (> 10s usually penalty or damage)
-    valid_stops = df[df['duration'] < 10.0].copy()
+    # Filter outliers (> 10s usually penalty or damage).
+    # The filter already yields a new frame and columns are only added via assign(), so no defensive copies.
+    valid_stops = pit_df.query('duration < 10.0', engine='numexpr').dropna(subset=['season'])
     
-    # Calculate Season Stats
-    season_stats = valid_stops.groupby('season')['duration'].agg(['mean', 'std']).reset_index()
+    # Calculate Season Stats, already aligned to each stop (no merge back needed)
+    season_duration = valid_stops.groupby('season')['duration']
+    season_mean = season_duration.transform('mean')
+    season_std = season_duration.transform('std')
     
-    # Merge and Calculate Z-Score
-    valid_stops = valid_stops.merge(season_stats, on='season', suffixes=('', '_season'))
-    valid_stops['z_score'] = (valid_stops['duration'] - valid_stops['mean']) / valid_stops['std']
+    # Calculate Z-Score
+    valid_stops = valid_stops.assign(z_score=(valid_stops['duration'] - season_mean) / season_std)
     
     # Aggregate by Team (Constructor) - Wait, pit_df from Ergast doesn't have constructorId!
     # We must merge with Results or Schedule.
@@ -55,67 +62,22 @@ def calculate_driver_track_score(results_df: pd.DataFrame) -> pd.DataFrame:
     if results_df.empty:
         return pd.DataFrame()
         
-    df = results_df.copy()
-    df = df.sort_values(['driver_id', 'circuit_id', 'season'], ascending=[True, True, False])
-    
-    scores = []
-    
-    # Group by Driver and Circuit
-    # Optimization: Vectorized approach is hard with rolling on dates, so iterate groups?
-    # Or use rolling on sorted data.
-    
-    for (driver, circuit), group in df.groupby(['driver_id', 'circuit_id']):
-        # group is sorted desc by season (recent first)
-        
-        # Career Avg
-        career_avg = group['points'].mean()
-        
-        # Recent Avg (Last 2)
-        recent_avg = group.head(2)['points'].mean()
-        
-        # Score
-        score = 0.7 * recent_avg + 0.3 * career_avg
-        
-        # Append score to the LATEST race for this driver/circuit (to be used as feature for NEXT race? 
-        # No, usually we want this feature available for the current race prediction based on PAST data.
-        # So we should calculate this *prior* to the race.
-        # This function calculates the score *after* the race? 
-        # We need a rolling calculation.
-        pass
-    
-    # Better approach: Rolling calculation
-    # Sort by date
-    df = df.sort_values('date')
-    
-    # We want the score available *before* the race. So shift?
-    # Actually, for training, the feature for 2024 Bahrain should be based on 2023, 2022...
-    
-    # Let's simple function:
-    # 1. Calculate historical stats up to date T.
-    # This is expensive.
-    # Alternative: Just use the static score based on *all* history for now (data leakage for training?)
-    # For strict ML, we must exclude current race.
-    
-    # Let's implement non-leaking rolling score.
+    # Non-leaking rolling score: the feature for 2024 Bahrain is based on 2023, 2022...
     # Group by driver, circuit. shift(1) to exclude current. expanding().mean() for career.
     # rolling(2).mean() for recent.
     
-    # Re-sort for rolling
-    df = df.sort_values(['driver_id', 'circuit_id', 'date'])
+    # Sort once so each driver/circuit group is in date order (the sort returns a new frame)
+    df = results_df.sort_values(['driver_id', 'circuit_id', 'date'])
+    keys = ['driver_id', 'circuit_id']
     
-    # Career Avg (up to previous race)
-    df['points_shifted'] = df.groupby(['driver_id', 'circuit_id'])['points'].shift(1)
-    df['career_avg'] = df.groupby(['driver_id', 'circuit_id'])['points_shifted'].expanding().mean()
+    # Points up to the previous visit
+    df['points_shifted'] = df.groupby(keys, sort=False, observed=True)['points'].shift(1)
     
+    grouped = df.groupby(keys, sort=False, observed=True)['points_shifted']
+    # Career Avg (up to previous race)
+    df['career_avg'] = grouped.expanding().mean().reset_index(level=[0, 1], drop=True)
     # Recent Avg (last 2 races before today)
-    df['recent_avg'] = df.groupby(['driver_id', 'circuit_id'])['points_shifted'].rolling(window=2, min_periods=1).mean().reset_index(0, drop=True).reset_index(0, drop=True) 
-    # Note: reset_index details depend on pandas version and group keys. safely use transform?
-    
-    # Pandas rolling handling
-    # Let's do it cleaner
-    grouped = df.groupby(['driver_id', 'circuit_id'])['points_shifted']
-    df['career_avg'] = grouped.expanding().mean().reset_index(level=[0,1], drop=True)
-    df['recent_avg'] = grouped.rolling(window=2, min_periods=1).mean().reset_index(level=[0,1], drop=True)
+    df['recent_avg'] = grouped.rolling(window=2, min_periods=1).mean().reset_index(level=[0, 1], drop=True)
     
     # Fill NA (Rookies)
     df['career_avg'] = df['career_avg'].fillna(0)
@@ -133,16 +95,20 @@ def add_weather_context(df: pd.DataFrame, circuit_id_col: str = 'circuit_id', te
     if df.empty:
         return df
         
-    # Circuit Type
-    df['circuit_type'] = df[circuit_id_col].map(CIRCUIT_TYPES).fillna('Unknown')
+    # Rows without a circuit have no circuit stats (the stats used to be inner-merged back on it)
+    df = df.dropna(subset=[circuit_id_col])
+    
+    # Circuit Type: one vectorized code lookup, then an array gather instead of a dict lookup per row
+    # (assign returns a new frame, so the caller's df is left untouched)
+    codes = CIRCUIT_IDS.get_indexer(df[circuit_id_col])
+    df = df.assign(circuit_type=CIRCUIT_TYPE_LUT[codes])
     
     # Weather Anomaly
     # Calculate historical stats (strictly, should be done on training set only, but for feature engineering script, okay)
     # We need a historical dataset of weather. 
     # If df IS the historical dataset:
-    stats = df.groupby(circuit_id_col)[temp_col].agg(['mean', 'std']).reset_index()
-    
-    df = df.merge(stats, on=circuit_id_col, suffixes=('', '_hist'))
+    circuit_temp = df.groupby(circuit_id_col)[temp_col]
+    df = df.assign(mean=circuit_temp.transform('mean'), std=circuit_temp.transform('std'))
     
     df['temp_anomaly_z'] = (df[temp_col] - df['mean']) / df['std']
     
@@ -157,71 +123,51 @@ def calculate_tire_life_probability(laps_df: pd.DataFrame) -> pd.DataFrame:
     if laps_df.empty:
         return pd.DataFrame()
         
-    df = laps_df.copy()
-    
     # 1. Calculate 'Pace Dropoff' (The Cliff)
     # We need rolling average lap time per stint.
     # Group by Driver, Stint.
     # Calculate rolling mean (window=3).
     # If (LapTime - RollingMean) > 1.5s -> Failure Event.
     
-    # Sort
-    df = df.sort_values(['driver_id', 'stint', 'lap_number'])
-    
-    # Rolling Mean
-    df['rolling_pace'] = df.groupby(['driver_id', 'stint'])['lap_duration'].transform(
-        lambda x: x.rolling(window=3, min_periods=1).mean().shift(1)
-    )
-    
-    # Identify Failure
-    # Only consider laps under Green condition? Assuming data is clean.
-    df['pace_delta'] = df['lap_duration'] - df['rolling_pace']
-    df['is_failure'] = (df['pace_delta'] > 1.5).astype(int)
-    
     # 2. Survival Analysis (Kaplan-Meier-ish)
     # Group by Circuit, Compound, Tire Age
     # Count Total Laps reached at this age vs Failures at this age.
     # P(Survive Age T) = P(Survive T-1) * (1 - Hazard(T))
     # Hazard(T) = Failures(T) / AtRisk(T)
     
-    survival_data = []
+    # Both steps run fused in one compiled pass over the laps (see strategy_kernels.tire_hazard),
+    # which needs them in stint order and every key as an integer code.
+    df = laps_df.sort_values(['driver_id', 'stint', 'lap_number'])
+    driver, _ = pd.factorize(df['driver_id'])
+    stint, _ = pd.factorize(df['stint'])
+    # Sorted codes, so the output comes out ordered by circuit, compound, age
+    circuit, circuits = pd.factorize(df['circuit_id'], sort=True)
+    compound, compounds = pd.factorize(df['compound'], sort=True)
+    
+    top_age = df['tire_age'].max()
+    max_age = int(top_age) if pd.notna(top_age) and top_age >= 1 else 0
+    
+    n_laps, n_failures, oldest = tire_hazard(
+        driver, stint, circuit, compound,
+        df['tire_age'].to_numpy(dtype=np.float64, na_value=np.nan),
+        df['lap_duration'].to_numpy(dtype=np.float64, na_value=np.nan),
+        len(circuits), len(compounds), max_age,
+    )
+    
+    # Ages nobody reached have no hazard, so survival carries over unchanged
+    hazard = np.divide(n_failures, n_laps, out=np.zeros(n_laps.shape), where=n_laps > 0)
+    survival = np.cumprod(1 - hazard, axis=2)
     
-    # Iterate Circuits
-    for circuit, c_df in df.groupby('circuit_id'):
-        # Iterate Compounds
-        for compound, comp_df in c_df.groupby('compound'):
-            # Calculate Hazard per Age
-            max_age = int(comp_df['tire_age'].max())
-            hazard_rates = []
-            
-            at_risk = len(comp_df['stint'].unique()) # Number of stints that started
-            # Wait, this is tricky. At risk reduces as stints end naturally OR fail.
-            # Simpler approach:
-            # Just count how many stints *reached* age T, and how many *failed* at age T.
-            
-            age_counts = comp_df.groupby('tire_age')['is_failure'].agg(['count', 'sum'])
-            # count = total laps driven at this age (At Risk)
-            # sum = failures at this age
-            
-            prob_survival = 1.0
-            
-            for age in range(1, max_age + 1):
-                if age in age_counts.index:
-                    n_at_risk = age_counts.loc[age, 'count']
-                    n_failed = age_counts.loc[age, 'sum']
-                    
-                    if n_at_risk > 0:
-                        hazard = n_failed / n_at_risk
-                        prob_survival *= (1 - hazard)
-                        
-                survival_data.append({
-                    'circuit_id': circuit,
-                    'compound': compound,
-                    'tire_age': age,
-                    'prob_survival': prob_survival
-                })
-                
-    return pd.DataFrame(survival_data)
+    # Every age from 1 up to the oldest tire seen for each circuit/compound
+    ages = np.arange(max_age + 1)
+    ci, co, age = np.nonzero((ages >= 1) & (ages <= np.floor(oldest)[..., None]))
+    
+    return pd.DataFrame({
+        'circuit_id': circuits.take(ci),
+        'compound': compounds.take(co),
+        'tire_age': age,
+        'prob_survival': survival[ci, co, age],
+    })
 
 def create_simulation_dataset(merged_df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -243,10 +189,8 @@ def create_simulation_dataset(merged_df: pd.DataFrame) -> pd.DataFrame:
     if merged_df.empty:
         return pd.DataFrame()
         
-    df = merged_df.copy()
-    
-    # Ensure sorted order
-    df = df.sort_values(['session_key', 'driver_number', 'date'])
+    # Ensure sorted order (the sort returns a new frame)
+    df = merged_df.sort_values(['session_key', 'driver_number', 'date'])
     
     # 1. Pit Stop Status
     # Assuming 'pit_duration' > 0 implies pit stop on this lap
@@ -284,10 +228,15 @@ def create_simulation_dataset(merged_df: pd.DataFrame) -> pd.DataFrame:
     # Filter to existing
     state_cols = [c for c in state_cols if c in df.columns]
     
-    sim_df = df[state_cols].copy()
+    sim_df = df[state_cols]
     
     # Create Targets (Next State)
-    sim_df['next_lap_time'] = sim_df.groupby(['session_key', 'driver_number'])['lap_duration'].shift(-1)
-    sim_df['next_position'] = sim_df.groupby(['session_key', 'driver_number'])['position'].shift(-1)
+    # assign() rather than setitem: sim_df is a column selection, which pandas < 3 (no default
+    # copy-on-write) would flag with SettingWithCopyWarning.
+    by_driver = sim_df.groupby(['session_key', 'driver_number'])
+    sim_df = sim_df.assign(
+        next_lap_time=by_driver['lap_duration'].shift(-1),
+        next_position=by_driver['position'].shift(-1),
+    )
     
-    return sim_df
+    return shrink_dtypes(sim_df)
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ingestion.cleaning import calculate_interval_delta
+
+
+@pytest.mark.parametrize("n", [0, 1, 5, 239, 240, 500])
+def test_interval_delta_matches_rolling_mean(n):
+    rng = np.random.default_rng(n)
+    interval = rng.normal(1.5, 0.3, n)
+    interval[::7] = np.nan
+    df = pd.DataFrame({"gap_to_leader": 0.0, "interval": interval})
+
+    out = calculate_interval_delta(df)
+
+    expected = pd.Series(interval).rolling(240, min_periods=1).mean()
+    np.testing.assert_allclose(out["interval_avg_60s"], expected)
+    np.testing.assert_allclose(out["interval_delta"], interval - expected)
@@ -0,0 +1,39 @@
+import json
+
+import schema_metadata
+from schema_metadata import summarize_csv
+
+
+def _details(summary):
+    return {c["name"]: c for c in summary["column_details"]}
+
+
+def test_timestamp_columns_stay_text(tmp_path):
+    path = tmp_path / "telemetry.csv"
+    path.write_text(
+        "date,local,day,speed\n"
+        "2024-12-08 14:15:34.203000+00:00,2024-12-08 14:15:34,2024-12-08,232\n"
+        "2024-12-08 14:15:34.363000+00:00,2024-12-08 14:15:35,2024-12-08,234\n"
+    )
+
+    summary = summarize_csv(path)
+    details = _details(summary)
+
+    # Same dtypes as pd.read_csv without parse_dates, and the report stays JSON-serializable
+    assert [details[c]["dtype"] for c in ("date", "local", "day")] == ["object"] * 3
+    assert details["speed"]["dtype"] == "int64"
+    assert details["date"]["examples"][0] == "2024-12-08 14:15:34.203000+00:00"
+    json.dumps(summary)
+
+
+def test_later_block_widens_inferred_type(tmp_path, monkeypatch):
+    # Tiny blocks, so the first block only sees integers / numbers
+    monkeypatch.setattr(schema_metadata, "BLOCK_SIZE", 64)
+    path = tmp_path / "laps.csv"
+    path.write_text("lap,time\n" + "1,90\n" * 40 + "2.5,DNF\n")
+
+    details = _details(summarize_csv(path))
+
+    assert details["lap"]["dtype"] == "float64"
+    assert details["time"]["dtype"] == "object"
+    assert details["lap"]["non_null"] == 41